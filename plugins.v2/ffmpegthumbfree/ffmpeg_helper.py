@@ -1,28 +1,328 @@
+import asyncio
+import functools
+import hashlib
 import json
+import logging
+import os
+import queue
+import re
+import select
+import sqlite3
 import subprocess
 import shutil
-from typing import Optional
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Union
 
-from app.utils.system import SystemUtils
+# 可选加速：orjson（C 实现）解析 ffprobe 输出比标准库快 3~5 倍，未安装时静默回退
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
+log = logging.getLogger(__name__)
 
-def _time_str_to_seconds(time_str: str) -> Optional[float]:
+# 外层并发度：批量 API 在派发任务前设置，单发调用保持默认 1。
+# 每个 ffmpeg 子进程的默认线程数 = 核数 // 外层并发度 —— 批量跑时每个子进程 1 线程
+# （核数交给任务级并行），交互式单发时一个子进程用满所有核
+_outer_concurrency: ContextVar = ContextVar("ffmpeg_outer_concurrency", default=1)
+
+
+def _default_threads() -> int:
+    """
+    根据外层并发度计算单个 ffmpeg 的线程数（至少为 1）
+    """
+    return max(1, (os.cpu_count() or 1) // _outer_concurrency.get())
+
+
+@functools.lru_cache(maxsize=None)
+def _which(exe_name: str) -> Optional[str]:
+    """
+    带缓存的 shutil.which：每个可执行名只扫描一次 PATH，
+    媒体库扫描时省掉成千上万次 stat() 系统调用
+    """
+    return shutil.which(exe_name)
+
+
+# 启动时解析为绝对路径：命令行里直接用绝对路径还能让 exec 跳过 execvp 的 PATH 遍历
+FFMPEG_BIN = _which("ffmpeg") or "ffmpeg"
+FFPROBE_BIN = _which("ffprobe") or "ffprobe"
+
+# ffprobe 结果磁盘缓存目录（进程重启后无需重新探测）
+_PROBE_CACHE_DIR = os.path.join(os.path.expanduser(
+    "~"), ".cache", "moviepilot", "ffprobe")
+_PROBE_CACHE_DB = os.path.join(_PROBE_CACHE_DIR, "probe.db")
+_probe_db_lock = threading.Lock()
+_probe_db_conn: Optional[sqlite3.Connection] = None
+
+
+def _probe_db() -> Optional[sqlite3.Connection]:
+    """
+    延迟打开（并按需建表）ffprobe 磁盘缓存，失败时返回 None（缓存仅是优化，不影响功能）
+    """
+    global _probe_db_conn
+    if _probe_db_conn is not None:
+        return _probe_db_conn
+    try:
+        os.makedirs(_PROBE_CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(_PROBE_CACHE_DB, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS probe (key TEXT PRIMARY KEY, data TEXT)")
+        conn.commit()
+        _probe_db_conn = conn
+        return conn
+    except Exception as e:
+        log.warning("ffprobe cache init failed: %s", e)
+        return None
+
+
+def _probe_cache_key(video_path: str, mtime_ns: int) -> str:
+    return f"{hashlib.sha1(video_path.encode('utf-8', errors='ignore')).hexdigest()}:{mtime_ns}"
+
+
+def _probe_disk_get(key: str) -> Optional[str]:
+    conn = _probe_db()
+    if not conn:
+        return None
+    try:
+        with _probe_db_lock:
+            row = conn.execute(
+                "SELECT data FROM probe WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    except Exception:
+        return None
+
+
+def _probe_disk_put(key: str, data: str):
+    conn = _probe_db()
+    if not conn:
+        return
+    try:
+        with _probe_db_lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO probe (key, data) VALUES (?, ?)", (key, data))
+            conn.commit()
+    except Exception:
+        pass
+
+
+# 进程内探测缓存：手写 dict 而非 lru_cache —— 只缓存成功结果，
+# 瞬时失败（NAS 忙导致的超时等）下次调用照常重试，不会把 None 记到 mtime 变化为止；
+# 且 timeout 只影响本次探测，不参与缓存键
+_probe_mem_cache: Dict[tuple, dict] = {}
+_probe_mem_lock = threading.Lock()
+_PROBE_MEM_MAX = 1024
+
+
+def _probe_cached(video_path: str, mtime_ns: int, size: int,
+                  streams: str = None, fast: bool = False,
+                  timeout: int = None) -> Optional[dict]:
+    """
+    带缓存的 ffprobe：以 (路径, mtime_ns, size, 探测模式) 为键，文件变化后自动失效
+    - 内存命中：直接返回（只有成功的探测会进内存缓存，失败不会被记住）
+    - 磁盘命中：从 sqlite 读回，免去一次 fork+exec+JSON 解析
+    - 未命中：真正执行 ffprobe，并把结果写入磁盘缓存
+    - fast=True 时收紧探测的字节数/时长预算；streams 只影响输出哪些流的信息
+    """
+    mem_key = (video_path, mtime_ns, size, streams, fast)
+    with _probe_mem_lock:
+        meta = _probe_mem_cache.get(mem_key)
+    if meta is not None:
+        return meta
+
+    key = _probe_cache_key(video_path, mtime_ns)
+    if fast or streams:
+        key += f":{streams or ''}:{int(fast)}"
+    meta = None
+    cached = _probe_disk_get(key)
+    if cached is not None:
+        try:
+            meta = _json_loads(cached)
+        except Exception:
+            meta = None
+    if meta is None:
+        if not FfmpegHelper._which("ffprobe"):
+            log.error("ffprobe not found in PATH")
+            return None
+        try:
+            command = [FFPROBE_BIN, "-v", "quiet"]
+            if fast:
+                # 收紧探测预算：默认 5MB/自动(≈5s) 收到 1MB/1s，
+                # 对象存储/网络挂载上的大文件少读绝大部分探测数据；
+                # 代价是流参数晚绑定的源可能缺字段，调用方按需回退 fast=False
+                command += ["-probesize", "1M", "-analyzeduration", "1000000"]
+            if streams:
+                command += ["-select_streams", streams]
+            command += ["-print_format", "json",
+                        "-show_format", "-show_streams", video_path]
+            ret = subprocess.run(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                timeout=timeout or FfmpegHelper.DEFAULT_TIMEOUT)
+            if ret.returncode == 0:
+                # 直接喂 bytes：orjson/标准库均接受，省一次整段 decode
+                meta = _json_loads(ret.stdout)
+                _probe_disk_put(key, json.dumps(meta, ensure_ascii=False))
+        except subprocess.TimeoutExpired:
+            log.error("ffprobe timeout: %s", video_path)
+        except Exception as e:
+            log.error("ffprobe exception: %s", e)
+
+    if meta is not None:
+        with _probe_mem_lock:
+            if len(_probe_mem_cache) >= _PROBE_MEM_MAX:
+                # 简单 FIFO 淘汰，防止媒体库扫描时无界增长
+                _probe_mem_cache.pop(next(iter(_probe_mem_cache)))
+            _probe_mem_cache[mem_key] = meta
+    return meta
+
+
+def _run_thumb_job(job: tuple, outer_concurrency: int = 1) -> Tuple[str, bool]:
+    """
+    ProcessPoolExecutor 的工作函数（必须是模块级函数才能被 pickle）
+    job 为 (video_path, image_path, frames)，返回 (image_path, 是否成功)
+    ContextVar 不会跨进程传播，外层并发度由父进程显式传入
+    """
+    _outer_concurrency.set(max(1, outer_concurrency))
+    video_path, image_path, frames = job
+    ok = FfmpegHelper.get_thumb(
+        video_path=video_path, image_path=image_path, frames=frames)
+    return image_path, bool(ok)
+
+
+@functools.lru_cache(maxsize=1024)
+def _probe_keyframes(video_path: str, mtime_ns: int, around: float,
+                     window: float = 10.0) -> tuple:
     """
-    把 "HH:MM:SS[.ms]" 或 "MM:SS" 或 "SS" 等格式转为秒(float)
+    用 ffprobe 读取 around±window 区间内视频流的关键帧 pts 列表（升序）
+    - -read_intervals 限制扫描范围，避免全文件建索引
+    - 结果以 (路径, mtime_ns, 区间) 为键缓存，与 ffprobe 元数据缓存同样自动失效
     """
+    if not FfmpegHelper._which("ffprobe"):
+        return ()
+    start = max(0.0, around - window)
     try:
-        parts = time_str.split(':')
-        parts = [float(p) for p in parts]
-        seconds = 0.0
-        for p in parts:
-            seconds = seconds * 60 + p
-        return seconds
+        command = [FFPROBE_BIN, "-v", "quiet",
+                   "-select_streams", "v:0",
+                   "-show_entries", "packet=pts_time,flags",
+                   "-of", "csv=p=0",
+                   "-read_intervals", f"{start:.3f}%{around + window:.3f}",
+                   video_path]
+        ret = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            timeout=FfmpegHelper.DEFAULT_TIMEOUT)
+        if ret.returncode != 0:
+            return ()
+        keyframes = []
+        for line in ret.stdout.decode("utf-8", errors="ignore").splitlines():
+            parts = line.strip().split(",")
+            # 形如 "12.345,K__"：flags 以 K 开头的才是关键帧包
+            if len(parts) >= 2 and parts[1].startswith("K"):
+                try:
+                    keyframes.append(float(parts[0]))
+                except ValueError:
+                    pass
+        return tuple(sorted(keyframes))
     except Exception:
+        return ()
+
+
+def _nearest_keyframe(video_path: str, secs: float) -> Optional[float]:
+    """
+    返回 secs 之前（含）最近的关键帧 pts，探测失败时返回 None
+    """
+    try:
+        st = os.stat(video_path)
+    except OSError:
         return None
+    candidates = [kf for kf in _probe_keyframes(
+        video_path, st.st_mtime_ns, round(secs, 3)) if kf <= secs]
+    return max(candidates) if candidates else None
+
+
+@functools.lru_cache(maxsize=1)
+def _hwaccels() -> tuple:
+    """
+    查询本机 ffmpeg 支持的硬件加速方式（vaapi/cuda/qsv/videotoolbox 等），
+    结果在进程内缓存，只探测一次
+    """
+    if not FfmpegHelper._which("ffmpeg"):
+        return ()
+    try:
+        ret = subprocess.run([FFMPEG_BIN, "-hide_banner", "-hwaccels"],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             timeout=10)
+        if ret.returncode != 0:
+            return ()
+        lines = ret.stdout.decode("utf-8", errors="ignore").splitlines()
+        return tuple(line.strip() for line in lines
+                     if line.strip() and ":" not in line)
+    except Exception:
+        return ()
+
+
+def _with_fast_probe(command: list) -> list:
+    """
+    返回在 -i 之前插入 -probesize/-analyzeduration 限制的命令副本：
+    截图只需要确定视频流的参数，把 ffmpeg 默认的探测预算（5MB/自动≈5s）
+    收紧到 1MB/0.1s，对 HTTP/对象存储挂载的源文件能显著减少打开时的读取量。
+    常见容器 1MB 内足以解析出视频流；个别流参数晚绑定的文件探测会失败，
+    由调用方的 strict_probe=True 回退路径兜底
+    """
+    idx = command.index("-i")
+    return command[:idx] + ["-probesize", "1M",
+                            "-analyzeduration", "100000"] + command[idx:]
+
+
+def _with_hwaccel(command: list) -> list:
+    """
+    返回在 -i 之前插入 -hwaccel auto 的命令副本（只影响输入解码，
+    two-stage seek 时位于外层 -ss 之后同样生效）
+    """
+    idx = command.index("-i")
+    return command[:idx] + ["-hwaccel", "auto"] + command[idx:]
+
+
+def _frames_to_seconds(frames: Union[str, float, int]) -> Optional[float]:
+    """
+    frames 支持直接传秒数（int/float）或 "HH:MM:SS" 字符串；
+    已是数值时直接返回，免去批量调用时的重复解析
+    """
+    if isinstance(frames, (int, float)):
+        return float(frames)
+    return _time_str_to_seconds(frames)
+
+
+# "HH:MM:SS[.ms]" / "MM:SS" / "SS[.ms]"
+_TS_RE = re.compile(r"^(?:(\d+):)?(?:(\d+):)?(\d+(?:\.\d+)?)$")
+
+
+@functools.lru_cache(maxsize=256)
+def _time_str_to_seconds(time_str: str) -> Optional[float]:
+    """
+    把 "HH:MM:SS[.ms]" 或 "MM:SS" 或 "SS" 等格式转为秒(float)，非法输入返回 None
+    批量调用时同一时间串只解析一次；不匹配走正则分支而非异常，
+    避免错误输入风暴下每次调用都构造异常对象
+    """
+    match = _TS_RE.match(time_str.strip()) if isinstance(
+        time_str, str) else None
+    if not match:
+        return None
+    first, second, sec = match.groups()
+    seconds = float(sec)
+    if second is not None:
+        # 两个前缀都在：HH:MM:SS
+        seconds += float(second) * 60 + float(first) * 3600
+    elif first is not None:
+        # 只有一个前缀：MM:SS
+        seconds += float(first) * 60
+    return seconds
 
 
 class FfmpegHelper:
-    # 默认限制 ffmpeg 使用的线程数（根据机器调整）
+    # 兜底的 ffmpeg 线程数；实际默认值由 _default_threads() 根据外层并发度自适应：
+    # 批量并行时每个子进程 1 线程，交互式单发时用满所有核
     DEFAULT_THREADS = 1
     # 在目标时间前预seek多少秒（two-stage seek），用来减少解码量同时保留精度
     DEFAULT_PRESEEK_OFFSET = 2.0
@@ -31,171 +331,276 @@ class FfmpegHelper:
 
     @staticmethod
     def _which(exe_name: str) -> Optional[str]:
-        return shutil.which(exe_name)
+        return _which(exe_name)
 
     @staticmethod
     def _run_cmd(command: list, timeout: int = DEFAULT_TIMEOUT) -> bool:
         """
         统一运行 subprocess 的包装：返回 True/False，不抛出异常（会打印错误）
+        参数保持 argv 列表、不走 shell、不传 preexec_fn/cwd：CPython 3.12+
+        配合 glibc >= 2.34 时 subprocess 会走 posix_spawn 快速路径，宿主进程
+        RSS 大时省掉 fork 复制页表的开销；更老的解释器仍是 fork+exec
         """
         try:
             # 使用 timeout 防止进程挂起
+            # stdout 从不被读取：直接丢给 DEVNULL，省掉一条管道及其全部 read 系统调用
             ret = subprocess.run(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                timeout=timeout)
             if ret.returncode == 0:
                 return True
-            # 若失败，打印 stderr 用于诊断
-            print(f"ffmpeg/ffprobe failed: {' '.join(command)}")
-            try:
-                print(ret.stderr.decode("utf-8", errors="ignore"))
-            except Exception:
-                pass
+            # 若失败，记录 stderr 用于诊断；%s 延迟格式化，级别未启用时不拼接命令行，
+            # 大段 stderr 的 decode 也只在 DEBUG 级别才做（失败风暴时不便宜）
+            log.error("ffmpeg/ffprobe failed: %s", command)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("%s", ret.stderr.decode("utf-8", errors="ignore"))
             return False
         except subprocess.TimeoutExpired:
-            print(f"ffmpeg/ffprobe timeout: {' '.join(command)}")
+            log.error("ffmpeg/ffprobe timeout: %s", command)
             return False
         except Exception as e:
-            print("Subprocess run exception:", e)
+            log.error("Subprocess run exception: %s", e)
             return False
 
     @staticmethod
-    def get_thumb(video_path: str, image_path: str, frames: str = None,
-                  threads: int = DEFAULT_THREADS, preseek_offset: float = DEFAULT_PRESEEK_OFFSET,
-                  timeout: int = DEFAULT_TIMEOUT):
+    def _thumb_commands(video_path: str, image_path: str, frames: Union[str, float],
+                        threads: int, preseek_offset: float,
+                        hwaccel: bool = True, keyframe_snap: bool = False,
+                        size: Optional[Tuple[int, int]] = None,
+                        strict_probe: bool = False,
+                        accurate: bool = True) -> List[list]:
         """
-        使用 ffmpeg 截图（two-stage seek）
-        - 为兼顾效率与精度：先快速 seek 到 (t - preseek_offset)（keyframe），再在输入后精确 seek preseek_offset 秒
+        构建截图命令列表（按优先级排序，前者失败时依次尝试后者）
+        - two-stage seek：先快速 seek 到 (t - preseek_offset)（keyframe），再在输入后精确 seek preseek_offset 秒
+        - keyframe_snap=True 时先用 ffprobe 找到目标前最近的关键帧，外层 -ss 直达该
+          关键帧、内层只解码 delta，严格最小化解码量（探测结果有缓存）
         - 若 frames 解析失败或 preseek_offset=0 则使用精确 seek（-ss 在 -i 之后）
+        - hwaccel=True 且本机有硬件解码器时，每条命令先尝试 -hwaccel auto 变体，
+          失败时自动落回纯软件解码（对 4K/HEVC 输入解码是主要开销）
+        - size=(宽, 高) 时先缩放到目标分辨率再编码（高为 -2 表示按宽度等比缩放），
+          JPEG 编码与色彩转换的耗时按像素面积线性下降（4K→480p 约 64 倍）
+        - 默认用小 -probesize/-analyzeduration 快速打开输入；流参数晚绑定的
+          变码率源可传 strict_probe=True 恢复 ffmpeg 的完整探测
+        - accurate=False 时单段 seek 加 -noaccurate_seek：直接取目标前最近关键帧，
+          完全跳过"解码再丢弃"的补齐段（通常 0.5~2s 的真实解码量），
+          代价是截图时间点向前吸附到关键帧（约 ±1~2s 误差），调用方需能接受
         """
-        if not frames:
-            frames = "00:03:01"
-        if not video_path or not image_path:
-            return False
+        secs = _frames_to_seconds(frames)
 
-        # 检查 ffmpeg 是否存在
-        if not FfmpegHelper._which("ffmpeg"):
-            print("ffmpeg not found in PATH")
-            return False
+        # 缩放时降低 -q:v 至 3：小图上视觉无差别，编码更快
+        if size:
+            width, height = size
+            scale_args = ["-vf", f"scale={width}:{height}:flags=fast_bilinear"]
+            quality = "3"
+        else:
+            scale_args = []
+            quality = "2"
 
-        secs = _time_str_to_seconds(frames)
-        # 如果无法解析时间字符串，则直接用原来的精确 seek（慢）
-        if secs is None:
+        # 关键帧对齐：用实际关键帧位置替代固定的 preseek 偏移
+        if keyframe_snap and secs is not None and secs > 0.0:
+            keyframe = _nearest_keyframe(video_path, secs)
+            if keyframe is not None and keyframe < secs:
+                preseek_offset = secs - keyframe
+
+        def _accurate(ss) -> list:
             # 精确 seek（准确但慢）
-            command = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            return [
+                FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
                 "-i", video_path,
-                "-ss", frames,
+                "-ss", str(ss),
                 "-vframes", "1",
-                "-q:v", "2",
+                *scale_args,
+                "-q:v", quality,
                 "-threads", str(threads),
                 image_path
             ]
-            return FfmpegHelper._run_cmd(command, timeout=timeout)
-
-        # two-stage seek: preseek 到 max(0, secs - preseek_offset)，然后在输入后做 delta 精确 seek
-        preseek_secs = max(0.0, secs - float(preseek_offset))
-        delta = secs - preseek_secs
 
-        # 如果 preseek_offset 为 0 或 delta 过小（例如 0.0），直接使用精确 seek（-ss after -i）
-        if preseek_secs <= 0.0 or preseek_offset <= 0.0:
-            command = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+        # 如果无法解析时间字符串，则直接用原来的精确 seek（慢）
+        if secs is None:
+            base = [_accurate(frames)]
+        elif not accurate:
+            # 关键帧吸附快路径：输入侧 seek 且不做精确补齐
+            base = [[
+                FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+                "-ss", f"{secs:.3f}",
+                "-noaccurate_seek",
                 "-i", video_path,
-                "-ss", str(secs),
-                "-vframes", "1",
-                "-q:v", "2",
+                "-frames:v", "1",
+                *scale_args,
+                "-q:v", quality,
                 "-threads", str(threads),
                 image_path
-            ]
-            return FfmpegHelper._run_cmd(command, timeout=timeout)
+            ], _accurate(f"{secs:.3f}")]
+        else:
+            # two-stage seek: preseek 到 max(0, secs - preseek_offset)，然后在输入后做 delta 精确 seek
+            preseek_secs = max(0.0, secs - float(preseek_offset))
+            delta = secs - preseek_secs
 
-        # two-stage: fast seek then accurate small seek
-        # 注意参数顺序：-ss 前置在 -i 之前；第二个 -ss 在输入之后。
-        command = [
-            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
-            "-ss", str(preseek_secs),
-            "-i", video_path,
-            "-ss", str(delta),
-            "-vframes", "1",
-            "-q:v", "2",
-            "-threads", str(threads),
-            image_path
-        ]
-        ok = FfmpegHelper._run_cmd(command, timeout=timeout)
-        # 若 two-stage 失败，可以回退到精确 seek（更慢但更可能成功）
-        if not ok:
-            fallback = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
-                "-i", video_path,
-                "-ss", str(secs),
-                "-vframes", "1",
-                "-q:v", "2",
-                "-threads", str(threads),
-                image_path
-            ]
-            return FfmpegHelper._run_cmd(fallback, timeout=timeout)
-        return True
+            # 如果 preseek_offset 为 0 或 delta 过小（例如 0.0），直接使用精确 seek（-ss after -i）
+            # 固定三位小数格式化，避免 str(float) 的尾数抖动产生不稳定的命令行
+            if preseek_secs <= 0.0 or preseek_offset <= 0.0:
+                base = [_accurate(f"{secs:.3f}")]
+            else:
+                # two-stage: fast seek then accurate small seek
+                # 注意参数顺序：-ss 前置在 -i 之前；第二个 -ss 在输入之后。
+                # 若 two-stage 失败，回退到精确 seek（更慢但更可能成功）
+                two_stage = [
+                    FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+                    "-ss", f"{preseek_secs:.3f}",
+                    "-i", video_path,
+                    "-ss", f"{delta:.3f}",
+                    "-vframes", "1",
+                    *scale_args,
+                    "-q:v", quality,
+                    "-threads", str(threads),
+                    image_path
+                ]
+                base = [two_stage, _accurate(f"{secs:.3f}")]
+
+        # 截图只要视频流：缩小探测窗口，减少打开输入时读取的字节数；
+        # 预算内探测不出流参数的源会快速失败，末尾保留一条完整探测的
+        # 精确 seek 命令兜底，调用方无需显式传 strict_probe=True
+        if not strict_probe:
+            fallback = _accurate(frames if secs is None else f"{secs:.3f}")
+            base = [_with_fast_probe(command) for command in base] + [fallback]
+
+        # 有硬件解码器时优先尝试 -hwaccel 变体，软件命令保留在后作为兜底
+        if hwaccel and _hwaccels():
+            commands = []
+            for command in base:
+                commands.append(_with_hwaccel(command))
+                commands.append(command)
+            return commands
+        return base
 
     @staticmethod
-    def extract_wav(video_path: str, audio_path: str, audio_index: str = None,
-                    threads: int = DEFAULT_THREADS, timeout: int = DEFAULT_TIMEOUT):
+    def get_thumb(video_path: str, image_path: str, frames: Union[str, float] = None,
+                  threads: int = None, preseek_offset: float = DEFAULT_PRESEEK_OFFSET,
+                  timeout: int = DEFAULT_TIMEOUT, hwaccel: bool = True,
+                  keyframe_snap: bool = False,
+                  size: Optional[Tuple[int, int]] = None,
+                  strict_probe: bool = False, accurate: bool = True,
+                  ctx: "FileContext" = None):
         """
-        从视频文件中提取 16000Hz, 16-bit 单声道 wav
-        - 加入 -vn 禁止视频处理，限制线程，设置超时
+        使用 ffmpeg 截图（two-stage seek，失败时回退精确 seek；
+        本机支持时优先硬件解码，失败自动落回软件解码；
+        keyframe_snap=True 时外层 seek 对齐到最近关键帧，只解码到目标的增量；
+        传入 ctx 可复用已有的探测结果，无视频流时直接短路）
         """
-        if not video_path or not audio_path:
+        # 数值 0 是合法时间点（截首帧），只有未传/空串才落默认值
+        if frames is None or frames == "":
+            frames = "00:03:01"
+        if not video_path or not image_path:
             return False
+        if ctx is not None and ctx.meta and not ctx.video_count:
+            log.warning("无视频流，跳过截图：%s", video_path)
+            return False
+
+        # 检查 ffmpeg 是否存在
         if not FfmpegHelper._which("ffmpeg"):
-            print("ffmpeg not found in PATH")
+            log.error("ffmpeg not found in PATH")
             return False
 
-        base = ["ffmpeg", "-hide_banner", "-loglevel",
+        threads = threads or _default_threads()
+        for command in FfmpegHelper._thumb_commands(
+                video_path, image_path, frames, threads, preseek_offset,
+                hwaccel=hwaccel, keyframe_snap=keyframe_snap, size=size,
+                strict_probe=strict_probe, accurate=accurate):
+            if FfmpegHelper._run_cmd(command, timeout=timeout):
+                return True
+        return False
+
+    @staticmethod
+    def _wav_command(video_path: str, audio_path: str, audio_index: str,
+                     threads: int) -> list:
+        """
+        构建 wav 提取命令（-vn 禁止视频处理，限制线程）
+        """
+        base = [FFMPEG_BIN, "-hide_banner", "-loglevel",
                 "error", "-nostdin", "-y", "-i", video_path, "-vn"]
         if audio_index is not None:
             base += ["-map", f"0:a:{audio_index}"]
 
         base += ["-acodec", "pcm_s16le", "-ac", "1", "-ar",
                  "16000", "-threads", str(threads), audio_path]
-        return FfmpegHelper._run_cmd(base, timeout=timeout)
+        return base
+
+    @staticmethod
+    def extract_wav(video_path: str, audio_path: str, audio_index: str = None,
+                    threads: int = None, timeout: int = DEFAULT_TIMEOUT,
+                    ctx: "FileContext" = None):
+        """
+        从视频文件中提取 16000Hz, 16-bit 单声道 wav
+        （传入 ctx 复用探测结果：无音频流时直接短路）
+        """
+        if not video_path or not audio_path:
+            return False
+        if ctx is not None and ctx.meta and not ctx.audio_count:
+            log.warning("无音频流，跳过提取：%s", video_path)
+            return False
+        if not FfmpegHelper._which("ffmpeg"):
+            log.error("ffmpeg not found in PATH")
+            return False
+        threads = threads or _default_threads()
+        return FfmpegHelper._run_cmd(
+            FfmpegHelper._wav_command(video_path, audio_path, audio_index, threads),
+            timeout=timeout)
 
     @staticmethod
-    def get_metadata(video_path: str, timeout: int = DEFAULT_TIMEOUT):
+    def get_metadata(video_path: str, timeout: int = DEFAULT_TIMEOUT,
+                     fast: bool = False, streams: str = None):
         """
-        获取视频元数据（ffprobe），使用超时并返回 dict 或 None
+        获取视频元数据（ffprobe），返回 dict 或 None
+        结果按 (路径, mtime, size) 缓存（内存 + 磁盘），同一文件重复探测近乎零开销
+        - 只需要时长/分辨率等基础信息时传 fast=True, streams="v:0"：
+          探测预算收紧到 1MB/1s，远程存储上的大文件少读绝大部分探测数据；
+          注意此时 streams 列表不含音频/字幕，别用来构建 FileContext
         """
         if not video_path:
             return None
-        if not FfmpegHelper._which("ffprobe"):
-            print("ffprobe not found in PATH")
-            return None
         try:
-            command = ["ffprobe", "-v", "quiet", "-print_format",
-                       "json", "-show_format", "-show_streams", video_path]
-            ret = subprocess.run(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
-            if ret.returncode == 0:
-                return json.loads(ret.stdout.decode("utf-8", errors="ignore"))
-        except subprocess.TimeoutExpired:
-            print("ffprobe timeout")
-        except Exception as e:
-            print("ffprobe exception:", e)
-        return None
+            st = os.stat(video_path)
+        except OSError as e:
+            log.error("ffprobe stat failed: %s", e)
+            return None
+        return _probe_cached(video_path, st.st_mtime_ns, st.st_size,
+                             streams=streams, fast=fast, timeout=timeout)
+
+    @staticmethod
+    def get_metadata_bulk(video_paths: List[str],
+                          max_workers: int = None) -> Dict[str, Optional[dict]]:
+        """
+        批量获取元数据：缓存未命中的文件用线程池并行探测（ffprobe 是 I/O/子进程密集型）
+        返回 {路径: 元数据或None}
+        """
+        if not video_paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1)) as executor:
+            results = executor.map(FfmpegHelper.get_metadata, video_paths)
+        return dict(zip(video_paths, results))
 
     @staticmethod
     def extract_subtitle(video_path: str, subtitle_path: str, subtitle_index: str = None,
-                         threads: int = DEFAULT_THREADS, timeout: int = DEFAULT_TIMEOUT):
+                         threads: int = None, timeout: int = DEFAULT_TIMEOUT,
+                         ctx: "FileContext" = None):
         """
         从视频中提取字幕。优先使用 -c:s copy 避免重新编码（更快）。
+        （传入 ctx 复用探测结果：无字幕流时直接短路，媒体库里大量无内挂
+        字幕的文件不再各起一个注定失败的 ffmpeg）
         """
         if not video_path or not subtitle_path:
             return False
+        if ctx is not None and ctx.meta and not ctx.subtitle_count:
+            log.warning("无字幕流，跳过提取：%s", video_path)
+            return False
         if not FfmpegHelper._which("ffmpeg"):
-            print("ffmpeg not found in PATH")
+            log.error("ffmpeg not found in PATH")
             return False
 
+        threads = threads or _default_threads()
         if subtitle_index is not None:
             command = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+                FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
                 "-i", video_path,
                 "-map", f"0:s:{subtitle_index}",
                 "-c:s", "copy",
@@ -205,7 +610,7 @@ class FfmpegHelper:
         else:
             # 如果用户没有指定字幕流，直接尝试导出第一个字幕流（可能需要 ffmpeg 自动选择）
             command = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+                FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
                 "-i", video_path,
                 "-c:s", "copy",
                 "-threads", str(threads),
@@ -213,6 +618,489 @@ class FfmpegHelper:
             ]
         return FfmpegHelper._run_cmd(command, timeout=timeout)
 
+    @staticmethod
+    def extract_all(video_path: str, image_path: str = None, audio_path: str = None,
+                    subtitle_path: str = None, frames: Union[str, float] = None,
+                    audio_index: str = None, subtitle_index: str = None,
+                    threads: int = None, timeout: int = DEFAULT_TIMEOUT) -> bool:
+        """
+        一次 ffmpeg 调用同时产出缩略图/音频/字幕（给哪个输出路径就产出哪个）：
+        容器只打开一次、索引只建一次，把三次 demux 成本摊薄为一次
+        - 缩略图在此走输出侧精确 seek（单次调用内无法对各输出分别做输入 seek），
+          只要一个极快的时间点请仍用 get_thumb
+        """
+        if not video_path:
+            return False
+        if not (image_path or audio_path or subtitle_path):
+            return False
+        if not FfmpegHelper._which("ffmpeg"):
+            log.error("ffmpeg not found in PATH")
+            return False
+
+        threads = threads or _default_threads()
+        command = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+                   "-nostdin", "-y", "-i", video_path]
+        if image_path:
+            secs = _frames_to_seconds(
+                frames if frames is not None else "00:03:01")
+            ss = f"{secs:.3f}" if secs is not None else str(frames)
+            command += ["-map", "0:v:0", "-ss", ss,
+                        "-vframes", "1", "-q:v", "2",
+                        "-threads", str(threads), image_path]
+        if audio_path:
+            command += ["-map", f"0:a:{audio_index if audio_index is not None else 0}",
+                        "-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000",
+                        "-threads", str(threads), audio_path]
+        if subtitle_path:
+            command += ["-map", f"0:s:{subtitle_index if subtitle_index is not None else 0}",
+                        "-c:s", "copy", subtitle_path]
+        return FfmpegHelper._run_cmd(command, timeout=timeout)
+
+    @staticmethod
+    async def _run_cmd_async(command: list, timeout: int = DEFAULT_TIMEOUT) -> bool:
+        """
+        _run_cmd 的协程版：单个事件循环线程即可同时监督大量 ffmpeg 子进程，
+        不再为每个并发任务占用一个 Python 线程
+        """
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                log.error("ffmpeg/ffprobe timeout: %s", command)
+                return False
+            if proc.returncode == 0:
+                return True
+            log.error("ffmpeg/ffprobe failed: %s", command)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("%s", stderr.decode("utf-8", errors="ignore"))
+            return False
+        except Exception as e:
+            log.error("Subprocess run exception: %s", e)
+            return False
+
+    @staticmethod
+    async def get_thumb_async(video_path: str, image_path: str,
+                              frames: Union[str, float] = None,
+                              threads: int = None,
+                              preseek_offset: float = DEFAULT_PRESEEK_OFFSET,
+                              timeout: int = DEFAULT_TIMEOUT,
+                              hwaccel: bool = True,
+                              keyframe_snap: bool = False,
+                              size: Optional[Tuple[int, int]] = None,
+                              strict_probe: bool = False,
+                              accurate: bool = True) -> bool:
+        """
+        get_thumb 的协程版（同样的 two-stage seek 与回退逻辑）
+        """
+        # 与 get_thumb 相同：数值 0 是合法时间点，不落默认值
+        if frames is None or frames == "":
+            frames = "00:03:01"
+        if not video_path or not image_path:
+            return False
+        if not FfmpegHelper._which("ffmpeg"):
+            log.error("ffmpeg not found in PATH")
+            return False
+
+        threads = threads or _default_threads()
+        for command in FfmpegHelper._thumb_commands(
+                video_path, image_path, frames, threads, preseek_offset,
+                hwaccel=hwaccel, keyframe_snap=keyframe_snap, size=size,
+                strict_probe=strict_probe, accurate=accurate):
+            if await FfmpegHelper._run_cmd_async(command, timeout=timeout):
+                return True
+        return False
+
+    @staticmethod
+    async def extract_wav_async(video_path: str, audio_path: str, audio_index: str = None,
+                                threads: int = None,
+                                timeout: int = DEFAULT_TIMEOUT) -> bool:
+        """
+        extract_wav 的协程版
+        """
+        if not video_path or not audio_path:
+            return False
+        if not FfmpegHelper._which("ffmpeg"):
+            log.error("ffmpeg not found in PATH")
+            return False
+        threads = threads or _default_threads()
+        return await FfmpegHelper._run_cmd_async(
+            FfmpegHelper._wav_command(video_path, audio_path, audio_index, threads),
+            timeout=timeout)
+
+    @staticmethod
+    async def get_thumbs_batch(jobs: List[tuple], concurrency: int = None,
+                               timeout: int = DEFAULT_TIMEOUT) -> List[bool]:
+        """
+        批量截图：jobs 为 (video_path, image_path, frames) 元组列表，
+        用 Semaphore 控制并发度，返回与 jobs 顺序一致的成功标记列表
+        """
+        if not jobs:
+            return []
+        limit = concurrency or os.cpu_count() or 1
+        semaphore = asyncio.Semaphore(limit)
+        # 声明外层并发度，让每个子进程的 -threads 自适应收敛到 1
+        token = _outer_concurrency.set(limit)
+
+        async def _one(job: tuple) -> bool:
+            video_path, image_path, frames = job
+            async with semaphore:
+                return await FfmpegHelper.get_thumb_async(
+                    video_path, image_path, frames=frames, timeout=timeout)
+
+        try:
+            return list(await asyncio.gather(*(_one(job) for job in jobs)))
+        finally:
+            _outer_concurrency.reset(token)
+
+    @staticmethod
+    def get_thumbs_batch_sync(jobs: List[tuple], concurrency: int = None,
+                              timeout: int = DEFAULT_TIMEOUT) -> List[bool]:
+        """
+        get_thumbs_batch 的同步入口，供非异步调用方使用
+        """
+        return asyncio.run(FfmpegHelper.get_thumbs_batch(
+            jobs, concurrency=concurrency, timeout=timeout))
+
+    @staticmethod
+    def get_thumbs_parallel(jobs: List[tuple],
+                            max_workers: int = None) -> List[Tuple[str, bool]]:
+        """
+        用进程池对整库截图任务做并行 fan-out（任务间完全独立，近线性加速）
+        - jobs 为 (video_path, image_path, frames) 元组列表
+        - 每个子进程内走现有 get_thumb 路径；其 -threads 默认为 1，
+          在任务级并行时这正是合理配置（核数交给进程池分配）
+        - 返回与 jobs 顺序一致的 (image_path, 是否成功) 列表
+        """
+        if not jobs:
+            return []
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                functools.partial(_run_thumb_job, outer_concurrency=workers), jobs))
+
+    @staticmethod
+    def get_thumbs_multi(video_path: str, timestamps: List[Union[str, float]],
+                         out_pattern: str, threads: int = None,
+                         timeout: int = DEFAULT_TIMEOUT) -> bool:
+        """
+        同一文件的多个时间点在一次 ffmpeg 调用内全部截出：
+        容器打开、索引构建、解码器初始化只发生一次，N 帧摊薄一次启动开销
+        - timestamps 为秒数或 "HH:MM:SS" 的列表（内部升序去重，ffmpeg 线性读取文件）
+        - out_pattern 形如 "thumb_%03d.jpg"，输出按时间升序从 1 开始编号
+        """
+        if not video_path or not out_pattern or not timestamps:
+            return False
+        if not FfmpegHelper._which("ffmpeg"):
+            log.error("ffmpeg not found in PATH")
+            return False
+
+        secs = sorted({s for s in (_frames_to_seconds(t)
+                                   for t in timestamps) if s is not None})
+        if not secs:
+            return False
+        try:
+            out_paths = [out_pattern % (i + 1) for i in range(len(secs))]
+        except (TypeError, ValueError):
+            log.error("invalid out_pattern: %s", out_pattern)
+            return False
+        # 每个时间点对应一条独立的输出腿：输出侧 -ss 丢弃目标时间之前的帧，
+        # -frames:v 1 保证每个时间点恰好写出一张（时间窗口选择在高帧率源上
+        # 会命中多帧、把总输出配额提前耗尽，后面的时间点就截不到了）；
+        # 解码仍只进行一次，N 个输出共享同一路解码帧
+        threads = threads or _default_threads()
+        command = [
+            FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-i", video_path,
+        ]
+        for s, out_path in zip(secs, out_paths):
+            command += ["-map", "0:v:0", "-ss", f"{s:.3f}",
+                        "-frames:v", "1", "-q:v", "2",
+                        "-threads", str(threads), out_path]
+        return FfmpegHelper._run_cmd(command, timeout=timeout)
+
+    @staticmethod
+    def get_best_thumb(video_path: str, image_path: str, frames: Union[str, float] = None,
+                       window: int = 100, size: Optional[Tuple[int, int]] = None,
+                       timeout: int = DEFAULT_TIMEOUT) -> bool:
+        """
+        质量优先的截图：从 frames 起的一小段内用 thumbnail 滤镜选出最有代表性的
+        一帧（直方图差异最大），适合海报/封面提取；固定时间点截图请用 get_thumb
+        - 直方图统计是计算密集且可切片并行的，这里刻意不限 -threads 为 1，
+          让单个 ffmpeg 用满所有核（与任务级并行的 get_thumbs_parallel 相反）
+        """
+        if not video_path or not image_path:
+            return False
+        if not FfmpegHelper._which("ffmpeg"):
+            log.error("ffmpeg not found in PATH")
+            return False
+
+        secs = _frames_to_seconds(
+            frames if frames is not None else "00:03:01")
+        if secs is None:
+            secs = 0.0
+        vf = f"thumbnail={window}"
+        if size:
+            vf += f",scale={size[0]}:{size[1]}:flags=fast_bilinear"
+        command = [
+            FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-ss", f"{secs:.3f}",
+            "-i", video_path,
+            "-t", "5",
+            "-vf", vf,
+            "-frames:v", "1",
+            "-q:v", "3",
+            "-threads", str(os.cpu_count() or 1),
+            image_path
+        ]
+        return FfmpegHelper._run_cmd(command, timeout=timeout)
+
+
+class FileContext:
+    """
+    同一文件做多种提取（截图 + 音频 + 字幕）时的共享探测上下文：
+    ffprobe 只跑一次（且命中全局缓存），各提取方法复用流布局，
+    没有对应流的提取直接短路返回，不再白白起一个注定失败的 ffmpeg
+    """
+
+    def __init__(self, video_path: str):
+        self.video_path = video_path
+        self.meta = FfmpegHelper.get_metadata(video_path) or {}
+        streams = self.meta.get("streams") or []
+        self.video_count = sum(
+            1 for s in streams if s.get("codec_type") == "video")
+        self.audio_count = sum(
+            1 for s in streams if s.get("codec_type") == "audio")
+        self.subtitle_count = sum(
+            1 for s in streams if s.get("codec_type") == "subtitle")
+
+    @property
+    def duration(self) -> Optional[float]:
+        try:
+            return float((self.meta.get("format") or {}).get("duration"))
+        except (TypeError, ValueError):
+            return None
+
+    def nearest_keyframe(self, secs: float) -> Optional[float]:
+        """
+        目标时间点前最近的关键帧（结果走全局关键帧缓存）
+        """
+        return _nearest_keyframe(self.video_path, secs)
+
+
+class _FfmpegWorker:
+    """
+    单个常驻 ffmpeg 进程：concat demuxer 从 stdin 连续接收任务，截图经 image2pipe 从 stdout 读回
+    """
+
+    def __init__(self):
+        self.jobs_done = 0
+        self._buffer = b""
+        # stderr 丢弃以免管道写满阻塞进程；失败的任务由调用方回退一次性路径处理
+        self.proc = subprocess.Popen(
+            [FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+             "-f", "concat", "-safe", "0", "-protocol_whitelist", "file,pipe",
+             "-i", "pipe:0",
+             "-f", "image2pipe", "-c:v", "mjpeg", "-q:v", "2", "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+            self.proc.terminate()
+            self.proc.wait(timeout=3)
+        except Exception:
+            try:
+                self.proc.kill()
+            except Exception:
+                pass
+
+    def _drain_stale(self) -> bool:
+        """
+        清掉缓冲与管道里残留的上个任务输出，返回是否发现了残留
+        """
+        stale = bool(self._buffer)
+        self._buffer = b""
+        fd = self.proc.stdout.fileno()
+        while True:
+            rlist, _, _ = select.select([fd], [], [], 0)
+            if not rlist:
+                break
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            stale = True
+        return stale
+
+    def has_trailing_output(self, grace: float = 0.05) -> bool:
+        """
+        收到帧之后、归还之前再观察一个宽限期：出现任何尾随字节说明本任务
+        吐出了多帧（outpoint 窗口在高帧率源上命中多个包）。checkout 时的
+        _drain_stale 只是时点检查，多余的帧此刻可能仍在 ffmpeg/管道内部、
+        晚些才冒出来并被误当成下个任务的结果，所以必须在归还侧把关
+        """
+        if self._buffer:
+            return True
+        fd = self.proc.stdout.fileno()
+        rlist, _, _ = select.select([fd], [], [], grace)
+        return bool(rlist)
+
+    def run_job(self, video_path: str, secs: float, timeout: int) -> Optional[bytes]:
+        """
+        提交一个截图任务并读回一帧 JPEG，失败或超时返回 None
+        """
+        # inpoint/outpoint 窗口在高帧率源上可能命中多个包、吐出多帧：
+        # 若发现上个任务的残留输出，说明成帧边界已不可信（残帧可能被当成
+        # 本次任务——甚至另一个文件——的结果），按成帧错误处理，
+        # 返回 None 让池回收本 worker，调用方走一次性回退路径
+        if self._drain_stale():
+            return None
+        # concat 指令中的单引号需转义为 '\''
+        escaped = video_path.replace("'", "'\\''")
+        directive = f"file '{escaped}'\ninpoint {secs:.3f}\noutpoint {secs + 0.04:.3f}\n"
+        self.proc.stdin.write(directive.encode("utf-8"))
+        self.proc.stdin.flush()
+        frame = self._read_frame(timeout)
+        if frame is not None:
+            self.jobs_done += 1
+        return frame
+
+    def _read_frame(self, timeout: int) -> Optional[bytes]:
+        """
+        在 stdout 字节流中按 JPEG SOI/EOI 边界切出一帧
+        （熵编码数据中 0xFF 会被转义为 0xFF00，EOI 标记不会出现在帧内部）
+        """
+        deadline = time.monotonic() + timeout
+        fd = self.proc.stdout.fileno()
+        while True:
+            end = self._buffer.find(b"\xff\xd9")
+            if end != -1:
+                start = self._buffer.find(b"\xff\xd8")
+                if start == -1 or start > end:
+                    return None
+                frame = self._buffer[start:end + 2]
+                self._buffer = self._buffer[end + 2:]
+                return frame
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                return None
+            rlist, _, _ = select.select([fd], [], [], remain)
+            if not rlist:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return None
+            self._buffer += chunk
+
+
+class FfmpegWorkerPool:
+    """
+    常驻 ffmpeg 工作进程池：把多次截图分摊到少量长生命周期的 ffmpeg 子进程上，
+    免去每张缩略图一次 fork+exec+动态链接+codec 初始化（约 50-200ms）的启动开销。
+    注意：concat demuxer 要求各输入的流参数一致，异构媒体库中 worker 可能中途退出，
+    任何失败都会自动回退到 FfmpegHelper.get_thumb 的一次性路径，结果不受影响。
+    """
+    # 默认常驻进程数
+    DEFAULT_WORKERS = 2
+    # 每个进程处理多少个任务后回收重建，防止 ffmpeg 内存缓慢增长
+    MAX_JOBS_PER_WORKER = 64
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_jobs: int = MAX_JOBS_PER_WORKER):
+        self._max_workers = max(1, workers)
+        self._max_jobs = max_jobs
+        self._idle: "queue.Queue[_FfmpegWorker]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _checkout(self) -> Optional[_FfmpegWorker]:
+        try:
+            worker = self._idle.get_nowait()
+            if worker.alive():
+                return worker
+            worker.close()
+            with self._lock:
+                self._created -= 1
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created >= self._max_workers:
+                return None
+            self._created += 1
+        try:
+            return _FfmpegWorker()
+        except Exception as e:
+            log.error("ffmpeg worker spawn failed: %s", e)
+            with self._lock:
+                self._created -= 1
+            return None
+
+    def _checkin(self, worker: _FfmpegWorker, ok: bool):
+        if ok and worker.alive() and worker.jobs_done < self._max_jobs:
+            self._idle.put(worker)
+            return
+        worker.close()
+        with self._lock:
+            self._created -= 1
+
+    def get_thumb(self, video_path: str, image_path: str, frames: Union[str, float] = None,
+                  timeout: int = FfmpegHelper.DEFAULT_TIMEOUT) -> bool:
+        """
+        用常驻 worker 截图；worker 不可用、任务失败或超时则回退一次性 ffmpeg 路径
+        （worker 固定输出 MJPEG 且帧字节原样落盘，只有 .jpg/.jpeg 目标才走
+        worker，其他扩展名如 .png 直接走一次性路径由 ffmpeg 按扩展名编码）
+        """
+        if not video_path or not image_path:
+            return False
+        secs = _frames_to_seconds(frames if frames is not None else "00:03:01")
+        worker = None
+        if secs is not None and os.path.splitext(
+                image_path)[1].lower() in (".jpg", ".jpeg"):
+            worker = self._checkout()
+        if worker is not None:
+            frame = None
+            stale = False
+            try:
+                frame = worker.run_job(video_path, secs, timeout)
+                if frame is not None:
+                    # 归还前的宽限期检查：本任务若吐出了多帧，该 worker 的
+                    # 流边界已不可信，回收重建而不是放回池里复用
+                    stale = worker.has_trailing_output()
+            except Exception as e:
+                log.error("ffmpeg worker job failed: %s", e)
+            self._checkin(worker, frame is not None and not stale)
+            if frame:
+                try:
+                    with open(image_path, "wb") as f:
+                        f.write(frame)
+                    return True
+                except OSError as e:
+                    log.error("write thumb failed: %s", e)
+        # 回退：一次性 ffmpeg（行为与未启用 worker 池时完全一致）
+        return FfmpegHelper.get_thumb(video_path=video_path, image_path=image_path,
+                                      frames=frames, timeout=timeout)
+
+    def shutdown(self):
+        """
+        关闭所有空闲 worker（使用中的 worker 在归还时自然回收）
+        """
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.close()
+            with self._lock:
+                self._created -= 1
+
+
 # 使用建议：
 # - 在 web 服务中不要直接在请求线程里同步调用这些方法（尤其是耗时的音频/字幕操作）。
 # - 建议用 ThreadPoolExecutor.submit(...) 或推到专门队列（Celery / RQ），只把结果写回数据库或通知前端。